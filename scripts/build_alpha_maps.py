@@ -0,0 +1,28 @@
+"""
+Bake the reference alpha map PNGs into .npy assets.
+
+load_alpha_map reads the .npy files so the PNGs are not decoded at startup.
+Re-run after changing bg_48.png or bg_96.png:
+
+    uv run python scripts/build_alpha_maps.py
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+from gemini_watermark_remover.core import LARGE_WATERMARK_SIZE, SMALL_WATERMARK_SIZE
+from gemini_watermark_remover.core.alpha_map import load_alpha_map_from_png
+
+ASSETS_DIR = Path(__file__).resolve().parent.parent / "src" / "gemini_watermark_remover" / "assets"
+
+
+def main() -> None:
+    for size in (SMALL_WATERMARK_SIZE, LARGE_WATERMARK_SIZE):
+        output_path = ASSETS_DIR / f"bg_{size}.npy"
+        np.save(output_path, load_alpha_map_from_png(size))
+        print(f"Wrote {output_path}")
+
+
+if __name__ == "__main__":
+    main()
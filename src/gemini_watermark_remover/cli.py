@@ -1,11 +1,23 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Optional
 
 import typer
 from rich.console import Console
 from rich.panel import Panel
-from rich.progress import BarColumn, Progress, SpinnerColumn, TaskProgressColumn, TextColumn
+from rich.progress import (
+    BarColumn,
+    Progress,
+    SpinnerColumn,
+    TaskID,
+    TaskProgressColumn,
+    TextColumn,
+)
 
+from .core import LARGE_WATERMARK_SIZE, SMALL_WATERMARK_SIZE
+from .core.alpha_map import get_alpha_map
 from .processors.image import SUPPORTED_IMAGE_FORMATS, is_supported_image, process_image
 from .processors.video import SUPPORTED_VIDEO_FORMATS, is_supported_video, process_video
 
@@ -17,21 +29,78 @@ app = typer.Typer(
 console = Console()
 
 
+SUPPORTED_FORMATS = SUPPORTED_IMAGE_FORMATS | SUPPORTED_VIDEO_FORMATS
+
+
+class VideoProgress:
+    """Per-frame progress callback that only redraws when the percentage changes."""
+
+    def __init__(self, progress: Progress, task_id: TaskID):
+        self.progress = progress
+        self.task_id = task_id
+        self.last_percent = -1
+
+    def __call__(self, current: int, total: int) -> None:
+        percent = int(current / total * 100)
+        if percent != self.last_percent:
+            self.last_percent = percent
+            self.progress.update(self.task_id, completed=percent)
+
+
+def init_image_worker() -> None:
+    """Warm up a batch worker so its first image costs the same as the rest."""
+    get_alpha_map(SMALL_WATERMARK_SIZE)
+    get_alpha_map(LARGE_WATERMARK_SIZE)
+
+
 def get_files_to_process(path: Path, recursive: bool = False) -> list[Path]:
     """Get all supported files from path (file or directory)."""
     if path.is_file():
         return [path]
 
     files = []
-    pattern = "**/*" if recursive else "*"
+    directories = [path]
 
-    for f in path.glob(pattern):
-        if f.is_file() and (is_supported_image(f) or is_supported_video(f)):
-            files.append(f)
+    # Walk with scandir so file types come from the directory listing and
+    # unsupported extensions are rejected before any stat call or Path object
+    while directories:
+        # Unreadable directories and entries are skipped, as Path.glob/rglob do
+        try:
+            with os.scandir(directories.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                directories.append(entry.path)
+                        elif (
+                            os.path.splitext(entry.name)[1].lower() in SUPPORTED_FORMATS
+                            and entry.is_file()
+                        ):
+                            files.append(Path(entry.path))
+                    except OSError:
+                        continue
+        except OSError:
+            continue
 
     return sorted(files)
 
 
+def get_output_path(
+    file_path: Path,
+    input_path: Path,
+    output: Optional[Path],
+    output_dir: Optional[Path],
+    suffix: str,
+) -> Optional[Path]:
+    """Determine the output path for a file, or None to use the default naming."""
+    if output_dir:
+        extension = ".mp4" if is_supported_video(file_path) else ".png"
+        return output_dir / f"{file_path.stem}{suffix}{extension}"
+    if output and input_path.is_file():
+        return output
+    return None
+
+
 @app.command()
 def process(
     path: Path = typer.Argument(
@@ -63,6 +132,13 @@ def process(
         "-y",
         help="Overwrite existing output files without prompting",
     ),
+    jobs: Optional[int] = typer.Option(
+        None,
+        "--jobs",
+        "-j",
+        min=1,
+        help="Number of files to process in parallel (images default to CPU count, videos to 1)",
+    ),
 ):
     """
     Remove all AI watermarks from images and videos.
@@ -73,13 +149,13 @@ def process(
     Examples:
         gwr process image.png
         gwr process video.mp4 -o cleaned_video.mp4
-        gwr process ./photos/ -r --suffix "_nowatermark"
+        gwr process ./photos/ -r --suffix "_nowatermark" -j 4
     """
     files = get_files_to_process(path, recursive)
 
     if not files:
         console.print(f"[red]No supported files found in {path}[/red]")
-        console.print(f"Supported formats: {SUPPORTED_IMAGE_FORMATS | SUPPORTED_VIDEO_FORMATS}")
+        console.print(f"Supported formats: {SUPPORTED_FORMATS}")
         raise typer.Exit(1)
 
     # Determine output directory for batch processing
@@ -105,19 +181,12 @@ def process(
     ) as progress:
         main_task = progress.add_task("Processing files...", total=len(files))
 
-        for file_path in files:
-            progress.update(main_task, description=f"Processing {file_path.name}...")
+        # Resolve output paths and confirm overwrites up front, before any work starts
+        image_jobs: list[tuple[Path, Optional[Path]]] = []
+        video_jobs: list[tuple[Path, Optional[Path]]] = []
 
-            # Determine output path for this file
-            if output_dir:
-                file_output = (
-                    output_dir
-                    / f"{file_path.stem}{suffix}{'.mp4' if is_supported_video(file_path) else '.png'}"
-                )
-            elif output and path.is_file():
-                file_output = output
-            else:
-                file_output = None  # Use default naming
+        for file_path in files:
+            file_output = get_output_path(file_path, path, output, output_dir, suffix)
 
             # Check for overwrite
             if file_output and file_output.exists() and not overwrite:
@@ -125,26 +194,72 @@ def process(
                     progress.advance(main_task)
                     continue
 
-            try:
-                if is_supported_image(file_path):
+            if is_supported_image(file_path):
+                image_jobs.append((file_path, file_output))
+            elif is_supported_video(file_path):
+                video_jobs.append((file_path, file_output))
+
+        # Images are independent and CPU-bound, so spread them across processes.
+        # Workers are spawned rather than forked from this process, which is
+        # already running the progress refresh thread
+        max_workers = min(jobs or os.cpu_count() or 1, len(image_jobs))
+        if max_workers > 1:
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_image_worker,
+            ) as executor:
+                futures = {
+                    executor.submit(process_image, file_path, file_output, suffix): file_path
+                    for file_path, file_output in image_jobs
+                }
+                for future in as_completed(futures):
+                    file_path = futures[future]
+                    progress.update(main_task, description=f"Processed {file_path.name}")
+                    try:
+                        console.print(f"  [green]Image saved:[/green] {future.result()}")
+                    except Exception as e:
+                        console.print(f"  [red]Error processing {file_path}:[/red] {e}")
+                    progress.advance(main_task)
+        else:
+            for file_path, file_output in image_jobs:
+                progress.update(main_task, description=f"Processing {file_path.name}...")
+                try:
                     result = process_image(file_path, file_output, suffix)
                     console.print(f"  [green]Image saved:[/green] {result}")
+                except Exception as e:
+                    console.print(f"  [red]Error processing {file_path}:[/red] {e}")
+                progress.advance(main_task)
 
-                elif is_supported_video(file_path):
-                    frame_task = progress.add_task("  Frames...", total=100, visible=True)
+        # Videos run serially unless --jobs is given; concurrent videos share the
+        # CPUs by capping each video's ffmpeg threads at an equal share
+        video_workers = min(jobs or 1, len(video_jobs))
+        cpu_share = max(1, (os.cpu_count() or 1) // video_workers) if video_workers > 1 else None
 
-                    def video_progress(current: int, total: int):
-                        progress.update(frame_task, completed=int(current / total * 100))
+        def run_video(file_path: Path, file_output: Optional[Path]) -> None:
+            progress.update(main_task, description=f"Processing {file_path.name}...")
 
-                    result = process_video(file_path, file_output, suffix, video_progress)
-                    progress.remove_task(frame_task)
-                    console.print(f"  [green]Video saved:[/green] {result}")
+            try:
+                frame_task = progress.add_task(f"  {file_path.name}...", total=100, visible=True)
+                video_progress = VideoProgress(progress, frame_task)
+
+                result = process_video(file_path, file_output, suffix, video_progress, cpu_share)
+                progress.remove_task(frame_task)
+                console.print(f"  [green]Video saved:[/green] {result}")
 
             except Exception as e:
                 console.print(f"  [red]Error processing {file_path}:[/red] {e}")
 
             progress.advance(main_task)
 
+        if video_workers > 1:
+            with ThreadPoolExecutor(max_workers=video_workers) as executor:
+                for file_path, file_output in video_jobs:
+                    executor.submit(run_video, file_path, file_output)
+        else:
+            for file_path, file_output in video_jobs:
+                run_video(file_path, file_output)
+
     console.print("[bold green]Done![/bold green]")
 
 
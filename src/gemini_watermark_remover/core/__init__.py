@@ -3,6 +3,11 @@ ALPHA_THRESHOLD: float = 0.002  # Skip if alpha below this
 MAX_ALPHA: float = 0.99  # Clamp alpha to prevent division by near-zero
 LOGO_VALUE: int = 255  # White watermark value
 
+# Gemini watermark detection thresholds (on alpha values)
+DETECT_HIGH_ALPHA: float = 0.1  # Pixels expected to be visibly brightened
+DETECT_LOW_ALPHA: float = 0.05  # Pixels treated as background
+DETECT_VERY_HIGH_ALPHA: float = 0.5  # Pixels used to verify the blend formula
+
 # Resolution thresholds
 LARGE_IMAGE_THRESHOLD: int = 1024
 
@@ -23,6 +28,14 @@ PIXELS_720P: int = 1280 * 720  # 921,600
 PIXELS_1080P: int = 1920 * 1080  # 2,073,600
 PIXELS_4K: int = 3840 * 2160  # 8,294,400
 
+# Image output
+PNG_COMPRESS_LEVEL: int = 1  # zlib level for PNG output (fast, slightly larger files)
+JPEG_QUALITY: int = 95
+
+# Video pipeline
+VIDEO_QUEUE_SIZE: int = 8  # Frames buffered between decode, compute and encode stages
+GEMINI_LATCH_FRAMES: int = 10  # Consecutive detections before video frames skip the detector
+
 # Veo watermark settings
 # Veo watermark is "Veo" text in bottom-right corner
 # Uses fixed dimensions with ratio-based margins (based on actual measurements)
@@ -32,6 +45,8 @@ VEO_MARGIN_X_RATIO: float = 0.025   # ~2.5% from right edge
 VEO_MARGIN_Y_RATIO: float = 0.015   # ~1.5% from bottom edge
 VEO_MIN_MARGIN_X: int = 15          # Minimum margin from right
 VEO_MIN_MARGIN_Y: int = 15          # Minimum margin from bottom
+VEO_INPAINT_MARGIN: int = 10        # Context around the watermark used for inpainting
+VEO_MIN_MASK_PIXELS: int = 20       # Smaller (dilated) masks are noise, not watermark text
 
 # Temporal consistency constants (for video processing)
 # Optical flow parameters (Farneback algorithm)
@@ -41,9 +56,12 @@ OPTICAL_FLOW_WIN_SIZE: int = 15         # Window size
 OPTICAL_FLOW_ITERATIONS: int = 3        # Iterations at each level
 OPTICAL_FLOW_POLY_N: int = 5            # Pixel neighborhood size
 OPTICAL_FLOW_POLY_SIGMA: float = 1.2    # Gaussian std for derivatives
+OPTICAL_FLOW_SCALE: int = 2             # Downscale factor for flow estimation
 
 # Temporal blending parameters
 TEMPORAL_BLEND_ALPHA: float = 0.7       # Weight for current frame (0.7 = 70% current, 30% previous)
 SCENE_CUT_THRESHOLD: float = 30.0       # Max average flow magnitude before scene cut detection
 CHANGE_CLAMP_THRESHOLD: float = 50.0    # Max per-pixel change between frames
 FLOW_MAGNITUDE_THRESHOLD: float = 100.0 # Max flow magnitude before treating as scene cut
+STATIC_REGION_PADDING: int = 32         # Context around watermark regions for the static check
+STATIC_REGION_THRESHOLD: float = 1.0    # Max mean abs gray change for a region to count as static
@@ -1,16 +1,51 @@
+from dataclasses import dataclass
 from importlib import resources
 
 import numpy as np
 from numpy.typing import NDArray
-from PIL import Image
+
+from . import (
+    ALPHA_THRESHOLD,
+    DETECT_HIGH_ALPHA,
+    DETECT_LOW_ALPHA,
+    DETECT_VERY_HIGH_ALPHA,
+    LOGO_VALUE,
+    MAX_ALPHA,
+)
+
+
+@dataclass(frozen=True)
+class AlphaMapBundle:
+    """Per-pixel tables derived from an alpha map for reverse blending and detection."""
+
+    # Blend tables, shaped (size, size, 3) to match the RGB region exactly so the
+    # per-frame ufuncs run on contiguous operands instead of broadcasting.
+    # Pixels below ALPHA_THRESHOLD get identity values (1 and 0) so the reverse
+    # blend leaves them unchanged without a separate mask pass
+    one_minus_alpha: NDArray[np.float32]  # 1 - alpha
+    alpha_times_logo: NDArray[np.float32]  # alpha * LOGO_VALUE
+
+    # Detection tables. Each row of detection_weights averages the grayscale
+    # brightness of one pixel group over a flattened (size, size, 3) region, so
+    # one matrix-vector product yields the high, low and very-high alpha means
+    detection_weights: NDArray[np.float32]  # (3, size * size * 3)
+    high_alpha_count: int  # alpha >= DETECT_HIGH_ALPHA
+    low_alpha_count: int  # alpha < DETECT_LOW_ALPHA
+    very_high_alpha_count: int  # alpha >= DETECT_VERY_HIGH_ALPHA
+    avg_high_alpha: float
+    avg_very_high_alpha: float
+
 
 # Cache alpha maps to avoid reloading
-_alpha_map_cache: dict[int, NDArray[np.float32]] = {}
+_alpha_map_cache: dict[int, AlphaMapBundle] = {}
 
 
-def load_alpha_map(size: int) -> NDArray[np.float32]:
+def load_alpha_map_from_png(size: int) -> NDArray[np.float32]:
     """
-    Load and calculate alpha map from reference PNG.
+    Calculate alpha map from reference PNG.
+
+    Used by scripts/build_alpha_maps.py to bake the .npy assets, and as a
+    fallback when they are missing.
 
     Args:
         size: Watermark size (48 or 96)
@@ -18,25 +53,102 @@ def load_alpha_map(size: int) -> NDArray[np.float32]:
     Returns:
         Float32 numpy array of alpha values (0.0 to 1.0)
     """
+    # Pillow is only needed here, not on the normal load path
+    from PIL import Image
+
     filename = f"bg_{size}.png"
 
     # Load from package assets using importlib.resources
     with resources.files("gemini_watermark_remover.assets").joinpath(filename).open("rb") as f:
         img = Image.open(f)
-        img_array = np.array(img, dtype=np.float32)
+        img_array = np.asarray(img)
 
     # Calculate alpha as max(R, G, B) / 255.0
-    # The reference images encode alpha in RGB channels
+    # The reference images encode alpha in RGB channels; reduce in uint8 and
+    # only promote the single-channel result to float32
     if img_array.ndim == 3:
-        alpha_map = np.max(img_array[:, :, :3], axis=2) / 255.0
+        alpha_map = img_array[:, :, :3].max(axis=2).astype(np.float32)
     else:
-        alpha_map = img_array / 255.0
+        alpha_map = img_array.astype(np.float32)
+    alpha_map /= 255.0
+
+    return alpha_map
+
+
+def load_alpha_map(size: int) -> NDArray[np.float32]:
+    """
+    Load precomputed alpha map for a watermark size.
+
+    Reads the float32 array baked into assets/bg_{size}.npy, which avoids
+    decoding the reference PNG at startup.
+
+    Args:
+        size: Watermark size (48 or 96)
+
+    Returns:
+        Float32 numpy array of alpha values (0.0 to 1.0)
+    """
+    asset = resources.files("gemini_watermark_remover.assets").joinpath(f"bg_{size}.npy")
+    if not asset.is_file():
+        return load_alpha_map_from_png(size)
+
+    with asset.open("rb") as f:
+        return np.load(f)
+
+
+def build_alpha_map_bundle(alpha_map: NDArray[np.float32]) -> AlphaMapBundle:
+    """
+    Precompute the tables used by reverse alpha blending.
+
+    Alpha maps are constant per watermark size, so everything that only
+    depends on alpha is computed once here instead of on every frame.
+    """
+    alpha_clipped = np.clip(alpha_map, 0, MAX_ALPHA).astype(np.float32)
+
+    # Only pixels with significant alpha are restored
+    mask = alpha_map >= ALPHA_THRESHOLD
+    one_minus_alpha = np.where(mask, 1.0 - alpha_clipped, 1.0).astype(np.float32)
+    alpha_times_logo = np.where(mask, alpha_clipped * LOGO_VALUE, 0.0).astype(np.float32)
+
+    # Expand once to the RGB region shape
+    one_minus_alpha = np.repeat(one_minus_alpha[:, :, np.newaxis], 3, axis=2)
+    alpha_times_logo = np.repeat(alpha_times_logo[:, :, np.newaxis], 3, axis=2)
+
+    # Detection pixel groups and their mean-of-RGB weights
+    alpha_flat = alpha_clipped.ravel()
+    groups = [
+        alpha_flat >= DETECT_HIGH_ALPHA,
+        alpha_flat < DETECT_LOW_ALPHA,
+        alpha_flat >= DETECT_VERY_HIGH_ALPHA,
+    ]
+    counts = [int(group.sum()) for group in groups]
+
+    detection_weights = np.zeros((len(groups), alpha_flat.size), dtype=np.float32)
+    for row, (group, count) in enumerate(zip(groups, counts)):
+        if count:
+            detection_weights[row, group] = 1.0 / (3 * count)
+    detection_weights = np.repeat(detection_weights, 3, axis=1)
+
+    high_alpha, _, very_high_alpha = groups
+
+    # Bundles are cached and shared by every caller, so guard them against writes
+    for table in (one_minus_alpha, alpha_times_logo, detection_weights):
+        table.setflags(write=False)
 
-    return alpha_map.astype(np.float32)
+    return AlphaMapBundle(
+        one_minus_alpha=one_minus_alpha,
+        alpha_times_logo=alpha_times_logo,
+        detection_weights=detection_weights,
+        high_alpha_count=counts[0],
+        low_alpha_count=counts[1],
+        very_high_alpha_count=counts[2],
+        avg_high_alpha=float(alpha_flat[high_alpha].mean()) if counts[0] else 0.0,
+        avg_very_high_alpha=float(alpha_flat[very_high_alpha].mean()) if counts[2] else 0.0,
+    )
 
 
-def get_alpha_map(size: int) -> NDArray[np.float32]:
-    """Get cached alpha map or load if not cached."""
+def get_alpha_map(size: int) -> AlphaMapBundle:
+    """Get cached alpha map bundle or load if not cached."""
     if size not in _alpha_map_cache:
-        _alpha_map_cache[size] = load_alpha_map(size)
+        _alpha_map_cache[size] = build_alpha_map_bundle(load_alpha_map(size))
     return _alpha_map_cache[size]
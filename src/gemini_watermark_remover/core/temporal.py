@@ -1,5 +1,8 @@
 """Temporal consistency for video watermark removal using optical flow."""
 
+from dataclasses import dataclass
+from functools import lru_cache
+
 import cv2
 import numpy as np
 from numpy.typing import NDArray
@@ -12,8 +15,11 @@ from . import (
     OPTICAL_FLOW_POLY_N,
     OPTICAL_FLOW_POLY_SIGMA,
     OPTICAL_FLOW_PYR_SCALE,
+    OPTICAL_FLOW_SCALE,
     OPTICAL_FLOW_WIN_SIZE,
     SCENE_CUT_THRESHOLD,
+    STATIC_REGION_PADDING,
+    STATIC_REGION_THRESHOLD,
     TEMPORAL_BLEND_ALPHA,
 )
 from .position import VeoWatermarkPosition, WatermarkPosition
@@ -22,19 +28,30 @@ from .position import VeoWatermarkPosition, WatermarkPosition
 def compute_optical_flow(
     prev_gray: NDArray[np.uint8],
     curr_gray: NDArray[np.uint8],
+    scale: int = OPTICAL_FLOW_SCALE,
 ) -> NDArray[np.float32]:
     """
     Compute dense optical flow between two grayscale frames.
 
-    Uses Farneback algorithm for dense optical flow estimation.
+    Uses Farneback algorithm for dense optical flow estimation. The flow is
+    estimated on frames downscaled by `scale` (Farneback cost grows with the
+    pixel count) and resized back to full resolution.
 
     Args:
         prev_gray: Previous frame in grayscale (H, W)
         curr_gray: Current frame in grayscale (H, W)
+        scale: Downscale factor for flow estimation (1 = full resolution)
 
     Returns:
         flow: Optical flow field (H, W, 2) where [:,:,0] is dx and [:,:,1] is dy
     """
+    h, w = prev_gray.shape[:2]
+    small_w, small_h = max(1, w // scale), max(1, h // scale)
+
+    if (small_w, small_h) != (w, h):
+        prev_gray = cv2.resize(prev_gray, (small_w, small_h), interpolation=cv2.INTER_AREA)
+        curr_gray = cv2.resize(curr_gray, (small_w, small_h), interpolation=cv2.INTER_AREA)
+
     flow = cv2.calcOpticalFlowFarneback(
         prev_gray,
         curr_gray,
@@ -47,6 +64,13 @@ def compute_optical_flow(
         poly_sigma=OPTICAL_FLOW_POLY_SIGMA,
         flags=0,
     )
+
+    if (small_w, small_h) != (w, h):
+        # Back to full resolution, rescaling displacements to full-size pixels
+        flow = cv2.resize(flow, (w, h), interpolation=cv2.INTER_LINEAR)
+        flow[:, :, 0] *= w / small_w
+        flow[:, :, 1] *= h / small_h
+
     return flow
 
 
@@ -73,9 +97,41 @@ def detect_scene_cut(
     return avg_magnitude > threshold or max_magnitude > FLOW_MAGNITUDE_THRESHOLD
 
 
+@dataclass
+class RegionScratch:
+    """Reusable float32 buffers for the temporal processing of one region."""
+
+    map_x: NDArray[np.float32]  # (H, W) remap x coordinates
+    map_y: NDArray[np.float32]  # (H, W) remap y coordinates
+    source: NDArray[np.float32]  # (H, W, C) previous result cast to float32
+    warped: NDArray[np.float32]  # (H, W, C) warped previous result
+    change: NDArray[np.float32]  # (H, W, C) blend and clamp workspace
+
+
+def allocate_region_scratch(h: int, w: int, channels: int = 3) -> RegionScratch:
+    """Allocate scratch buffers for an (h, w, channels) region."""
+    return RegionScratch(
+        map_x=np.empty((h, w), dtype=np.float32),
+        map_y=np.empty((h, w), dtype=np.float32),
+        source=np.empty((h, w, channels), dtype=np.float32),
+        warped=np.empty((h, w, channels), dtype=np.float32),
+        change=np.empty((h, w, channels), dtype=np.float32),
+    )
+
+
+@lru_cache(maxsize=8)
+def _coordinate_grid(h: int, w: int) -> tuple[NDArray[np.float32], NDArray[np.float32]]:
+    """Pixel coordinate grid (x, y) for a region size, shared across frames (read-only)."""
+    y_coords, x_coords = np.mgrid[0:h, 0:w].astype(np.float32)
+    x_coords.setflags(write=False)
+    y_coords.setflags(write=False)
+    return x_coords, y_coords
+
+
 def warp_region(
     region: NDArray[np.uint8],
     flow_region: NDArray[np.float32],
+    scratch: RegionScratch | None = None,
 ) -> NDArray[np.float32]:
     """
     Warp a region using optical flow to align with current frame.
@@ -85,24 +141,29 @@ def warp_region(
     Args:
         region: Region to warp (H, W, C)
         flow_region: Corresponding flow (H, W, 2)
+        scratch: Optional buffers to reuse across frames (allocated if None)
 
     Returns:
-        Warped region as float32 (H, W, C)
+        Warped region as float32 (H, W, C), backed by scratch.warped
     """
     h, w = region.shape[:2]
+    if scratch is None:
+        scratch = allocate_region_scratch(h, w, region.shape[2])
 
-    # Create coordinate grid
-    y_coords, x_coords = np.mgrid[0:h, 0:w].astype(np.float32)
+    # Coordinate grid is cached per region size
+    x_coords, y_coords = _coordinate_grid(h, w)
 
     # Apply flow (forward warp approximation using inverse mapping)
-    map_x = x_coords + flow_region[:, :, 0]
-    map_y = y_coords + flow_region[:, :, 1]
+    np.add(x_coords, flow_region[:, :, 0], out=scratch.map_x)
+    np.add(y_coords, flow_region[:, :, 1], out=scratch.map_y)
+    np.copyto(scratch.source, region)
 
     # Warp using bilinear interpolation
     warped = cv2.remap(
-        region.astype(np.float32),
-        map_x,
-        map_y,
+        scratch.source,
+        scratch.map_x,
+        scratch.map_y,
+        dst=scratch.warped,
         interpolation=cv2.INTER_LINEAR,
         borderMode=cv2.BORDER_REFLECT_101,
     )
@@ -110,47 +171,40 @@ def warp_region(
     return warped
 
 
-def blend_with_temporal(
-    current_result: NDArray[np.float32],
-    warped_previous: NDArray[np.float32],
-    alpha: float = TEMPORAL_BLEND_ALPHA,
-) -> NDArray[np.float32]:
-    """
-    Blend current frame result with motion-compensated previous frame.
-
-    Args:
-        current_result: Current frame's watermark removal result
-        warped_previous: Previous frame's result warped to align with current
-        alpha: Weight for current frame (higher = less smoothing)
-
-    Returns:
-        Blended result as float32
-    """
-    return alpha * current_result + (1 - alpha) * warped_previous
-
-
-def clamp_changes(
-    current: NDArray[np.float32],
+def blend_and_clamp(
+    current: NDArray[np.uint8],
     previous: NDArray[np.float32],
+    out: NDArray[np.uint8],
+    alpha: float = TEMPORAL_BLEND_ALPHA,
     max_change: float = CHANGE_CLAMP_THRESHOLD,
+    change: NDArray[np.float32] | None = None,
 ) -> NDArray[np.uint8]:
     """
-    Clamp aggressive pixel changes between frames.
+    Blend with the previous result and clamp the change in a single buffer.
 
-    Prevents flickering by limiting how much each pixel can change.
+    Computes previous + clip(blended - previous, -max_change, max_change) for
+    blended = alpha * current + (1 - alpha) * previous, using
+    blended - previous == alpha * (current - previous).
 
     Args:
-        current: Current frame result (float32)
-        previous: Previous frame result, motion-compensated (float32)
+        current: Current frame region (uint8)
+        previous: Previous frame region, motion-compensated (float32)
+        out: Destination for the uint8 result (may be a view of current)
+        alpha: Weight for current frame (higher = less smoothing)
         max_change: Maximum allowed change per pixel per channel
+        change: Optional float32 workspace shaped like current (allocated if None)
 
     Returns:
-        Clamped result as uint8
+        out, holding the clamped blend
     """
-    diff = current - previous
-    clamped_diff = np.clip(diff, -max_change, max_change)
-    result = previous + clamped_diff
-    return np.clip(result, 0, 255).astype(np.uint8)
+    change = np.subtract(current, previous, out=change, dtype=np.float32)
+    change *= alpha
+    np.clip(change, -max_change, max_change, out=change)
+    change += previous
+
+    # The result lies between previous and current, so it is already in [0, 255]
+    np.copyto(out, change, casting="unsafe")
+    return out
 
 
 class TemporalProcessor:
@@ -188,6 +242,14 @@ class TemporalProcessor:
         self.prev_veo_result: NDArray[np.uint8] | None = None
         self.frame_count: int = 0
 
+        # Frames whose watermark regions did not change, skipping optical flow
+        self.static_frame_count: int = 0
+        self._zero_flow: NDArray[np.float32] | None = None
+
+        # Per-region buffers reused every frame
+        self._gemini_scratch = allocate_region_scratch(gemini_pos.height, gemini_pos.width)
+        self._veo_scratch = allocate_region_scratch(veo_pos.height, veo_pos.width)
+
     def process_frame(
         self,
         original_frame: NDArray[np.uint8],
@@ -197,7 +259,8 @@ class TemporalProcessor:
         Apply temporal consistency to a processed frame.
 
         Args:
-            original_frame: Original frame before watermark removal (for flow computation)
+            original_frame: Original frame before watermark removal (for flow computation),
+                either RGB or already converted to grayscale
             current_result: Frame after watermark removal
 
         Returns:
@@ -206,20 +269,30 @@ class TemporalProcessor:
         self.frame_count += 1
 
         # Convert current frame to grayscale for flow computation
-        curr_gray = cv2.cvtColor(original_frame, cv2.COLOR_RGB2GRAY)
+        if original_frame.ndim == 2:
+            curr_gray = original_frame
+        else:
+            curr_gray = cv2.cvtColor(original_frame, cv2.COLOR_RGB2GRAY)
 
         # First frame - no temporal processing possible
         if self.prev_gray is None:
             self._update_state(curr_gray, current_result)
             return current_result
 
-        # Compute optical flow
-        flow = compute_optical_flow(self.prev_gray, curr_gray)
+        if self._regions_static(curr_gray):
+            # Nothing moved around the watermarks, so zero flow is exact there
+            self.static_frame_count += 1
+            if self._zero_flow is None or self._zero_flow.shape[:2] != curr_gray.shape:
+                self._zero_flow = np.zeros((*curr_gray.shape, 2), dtype=np.float32)
+            flow = self._zero_flow
+        else:
+            # Compute optical flow
+            flow = compute_optical_flow(self.prev_gray, curr_gray)
 
-        # Check for scene cut
-        if detect_scene_cut(flow):
-            self._update_state(curr_gray, current_result)
-            return current_result
+            # Check for scene cut
+            if detect_scene_cut(flow):
+                self._update_state(curr_gray, current_result)
+                return current_result
 
         # Apply temporal consistency to both watermark regions
         result = current_result.copy()
@@ -233,6 +306,7 @@ class TemporalProcessor:
             self.gemini_pos.width,
             self.gemini_pos.height,
             self.prev_gemini_result,
+            self._gemini_scratch,
         )
 
         # Process Veo region
@@ -244,6 +318,7 @@ class TemporalProcessor:
             self.veo_pos.width,
             self.veo_pos.height,
             self.prev_veo_result,
+            self._veo_scratch,
         )
 
         # Update state for next frame
@@ -251,6 +326,23 @@ class TemporalProcessor:
 
         return result
 
+    def _regions_static(self, curr_gray: NDArray[np.uint8]) -> bool:
+        """Check whether both watermark regions (with padding) match the previous frame."""
+        img_h, img_w = curr_gray.shape[:2]
+        pad = STATIC_REGION_PADDING
+
+        for pos in (self.gemini_pos, self.veo_pos):
+            y1, y2 = max(0, pos.y - pad), min(img_h, pos.y + pos.height + pad)
+            x1, x2 = max(0, pos.x - pad), min(img_w, pos.x + pos.width + pad)
+            if y1 >= y2 or x1 >= x2:
+                continue
+
+            diff = cv2.absdiff(self.prev_gray[y1:y2, x1:x2], curr_gray[y1:y2, x1:x2])
+            if diff.mean() >= STATIC_REGION_THRESHOLD:
+                return False
+
+        return True
+
     def _process_region(
         self,
         result: NDArray[np.uint8],
@@ -260,6 +352,7 @@ class TemporalProcessor:
         w: int,
         h: int,
         prev_region_result: NDArray[np.uint8] | None,
+        scratch: RegionScratch,
     ) -> NDArray[np.uint8]:
         """Apply temporal consistency to a single watermark region."""
         if prev_region_result is None:
@@ -279,19 +372,13 @@ class TemporalProcessor:
             return result  # Skip temporal for this region
 
         # Warp previous result to align with current
-        warped_prev = warp_region(prev_region_result, flow_region)
-
-        # Get current region result
-        current_region = result[y : y + h, x : x + w].astype(np.float32)
-
-        # Blend current with warped previous
-        blended = blend_with_temporal(current_region, warped_prev, self.blend_alpha)
-
-        # Clamp aggressive changes
-        clamped = clamp_changes(blended, warped_prev, self.clamp_threshold)
+        warped_prev = warp_region(prev_region_result, flow_region, scratch)
 
-        # Write back to result
-        result[y : y + h, x : x + w] = clamped
+        # Blend current with warped previous and clamp aggressive changes,
+        # writing straight back into the result
+        current_region = result[y : y + h, x : x + w]
+        blend_and_clamp(current_region, warped_prev, current_region,
+                        self.blend_alpha, self.clamp_threshold, scratch.change)
 
         return result
 
@@ -330,3 +417,4 @@ class TemporalProcessor:
         self.prev_gemini_result = None
         self.prev_veo_result = None
         self.frame_count = 0
+        self.static_frame_count = 0
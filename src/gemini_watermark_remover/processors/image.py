@@ -3,6 +3,7 @@ from pathlib import Path
 import numpy as np
 from PIL import Image
 
+from ..core import JPEG_QUALITY, PNG_COMPRESS_LEVEL
 from ..core.alpha_map import get_alpha_map
 from ..core.blend import remove_watermark
 from ..core.position import calculate_watermark_position
@@ -19,6 +20,7 @@ def process_image(
     input_path: Path,
     output_path: Path | None = None,
     suffix: str = "_output",
+    compression_level: int = PNG_COMPRESS_LEVEL,
 ) -> Path:
     """
     Process a single image to remove watermark.
@@ -27,6 +29,7 @@ def process_image(
         input_path: Path to input image
         output_path: Optional explicit output path. If None, uses input name with suffix.
         suffix: Suffix to add to filename if output_path not specified
+        compression_level: zlib compression level (0-9) when saving PNG
 
     Returns:
         Path to the output file
@@ -53,8 +56,11 @@ def process_image(
     # Remove watermark
     result_array = remove_watermark(image_array, alpha_map, position)
 
-    # Save result
+    # Save result (PNG deflate dominates the runtime at higher levels)
     result_image = Image.fromarray(result_array)
-    result_image.save(output_path, quality=95)
+    if output_path.suffix.lower() == ".png":
+        result_image.save(output_path, compress_level=compression_level)
+    else:
+        result_image.save(output_path, quality=JPEG_QUALITY)
 
     return output_path
@@ -1,18 +1,22 @@
+import json
 import subprocess
-import tempfile
 from collections.abc import Callable
+from functools import lru_cache
 from pathlib import Path
+from queue import Queue
+from threading import Thread
+from typing import BinaryIO
 
-import ffmpeg
+import cv2
 import numpy as np
-from PIL import Image
 
 from ..core import BITRATE_720P, BITRATE_1080P, BITRATE_4K, BITRATE_HIGHER
-from ..core import PIXELS_720P, PIXELS_1080P, PIXELS_4K
+from ..core import GEMINI_LATCH_FRAMES, PIXELS_720P, PIXELS_1080P, PIXELS_4K, VIDEO_QUEUE_SIZE
+from ..core import VEO_INPAINT_MARGIN, VEO_MIN_MASK_PIXELS
 from ..core.alpha_map import get_alpha_map
-from ..core.blend import remove_watermark
+from ..core.blend import is_watermark_present, remove_watermark
 from ..core.position import calculate_veo_watermark_position, calculate_watermark_position
-from ..core.position import VeoWatermarkPosition
+from ..core.position import VeoWatermarkPosition, WatermarkPosition
 from ..core.temporal import TemporalProcessor
 
 SUPPORTED_VIDEO_FORMATS = {".mp4", ".webm", ".mov", ".avi", ".mkv"}
@@ -23,9 +27,19 @@ def is_supported_video(path: Path) -> bool:
     return path.suffix.lower() in SUPPORTED_VIDEO_FORMATS
 
 
+# Only the fields get_video_info reads, so ffprobe skips serializing the rest.
+# Rotation comes from the display matrix side data (or the legacy rotate tag)
+_PROBE_ENTRIES = (
+    "stream=codec_type,width,height,r_frame_rate:stream_side_data=rotation"
+    ":stream_tags=rotate:format=duration"
+)
+
+
 def get_video_info(input_path: Path) -> dict:
     """Get video metadata using ffprobe."""
-    probe = ffmpeg.probe(str(input_path))
+    probe_cmd = ["ffprobe", "-v", "error", "-show_entries", _PROBE_ENTRIES,
+                 "-of", "json", str(input_path)]
+    probe = json.loads(subprocess.run(probe_cmd, capture_output=True, check=True).stdout)
     video_stream = next(s for s in probe["streams"] if s["codec_type"] == "video")
 
     # Check for audio stream
@@ -37,6 +51,15 @@ def get_video_info(input_path: Path) -> dict:
     width = int(video_stream["width"])
     height = int(video_stream["height"])
 
+    # ffmpeg autorotates while decoding, so frames of a video rotated by 90 or
+    # 270 degrees arrive with width and height swapped
+    rotation = int(float(video_stream.get("tags", {}).get("rotate", 0)))
+    for side_data in video_stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            rotation = int(float(side_data["rotation"]))
+    if rotation % 180 == 90:
+        width, height = height, width
+
     # Parse frame rate (can be "30/1" or "29.97")
     fps_str = video_stream.get("r_frame_rate", "30/1")
     if "/" in fps_str:
@@ -72,108 +95,236 @@ def calculate_bitrate(width: int, height: int) -> int:
         return BITRATE_HIGHER
 
 
-def remove_veo_watermark(
-    image_array: np.ndarray,
-    veo_pos: VeoWatermarkPosition,
-) -> np.ndarray:
+@lru_cache(maxsize=4)
+def _feather_weights(h: int, w: int, feather_size: int) -> tuple[np.ndarray, np.ndarray]:
     """
-    Remove Veo watermark using hybrid approach with OpenCV inpainting.
+    Fixed-point (x256) source/target weights for the feathered Veo static blend.
 
-    For static/uniform backgrounds: sample from above (cleaner result).
-    For dynamic content: use OpenCV inpainting to fill watermark regions naturally.
+    Feathering the top rows and then the left columns with ramps a_i and b_j
+    gives source weight a_i * b_j per pixel, so both passes fold into one mask.
+    """
+    ramp = np.arange(feather_size) / feather_size
+    row_weights = np.ones(h)
+    row_weights[:feather_size] = ramp[:h]
+    col_weights = np.ones(w)
+    col_weights[:feather_size] = ramp[:w]
 
-    Args:
-        image_array: Input image as numpy array (H, W, C)
-        veo_pos: Veo watermark position
+    source_weights = np.rint(np.outer(row_weights, col_weights) * 256).astype(np.uint16)
+    source_weights = source_weights[:, :, np.newaxis]
+    target_weights = 256 - source_weights
+    source_weights.setflags(write=False)
+    target_weights.setflags(write=False)
+    return source_weights, target_weights
 
-    Returns:
-        Modified image array with Veo watermark removed
+
+def _make_veo_remover(
+    veo_pos: VeoWatermarkPosition,
+    img_h: int,
+    img_w: int,
+    reuse_unchanged: bool = False,
+) -> Callable[[np.ndarray], np.ndarray]:
     """
-    import cv2
-    from scipy.ndimage import gaussian_filter
+    Build a Veo remover specialized for one watermark position and frame size.
 
+    The position is fixed for a whole video, so bounds checks, region slices,
+    the inpainting box and the feather weights are resolved once here instead
+    of on every frame.
+
+    With reuse_unchanged, the remover keeps the pixels it last read and wrote;
+    a frame whose input window is byte-identical to the previous one gets the
+    previous result copied in without redoing the sampling or inpainting.
+    """
     x, y = veo_pos.x, veo_pos.y
     w, h = veo_pos.width, veo_pos.height
-    img_h, img_w = image_array.shape[:2]
 
     # Bounds checking
     if x < 0 or y < 0 or x + w > img_w or y + h > img_h:
-        return image_array
+        return lambda image_array: image_array
 
     # Ensure we have enough space above to sample from
     if y < h:
-        return image_array
+        return lambda image_array: image_array
 
-    # Get regions for comparison
-    target_region = image_array[y : y + h, x : x + w].astype(np.float32)
-    source_region = image_array[y - h : y, x : x + w].astype(np.float32)
+    # Target region and the region above it to sample from
+    target = (slice(y, y + h), slice(x, x + w))
+    source = (slice(y - h, y), slice(x, x + w))
 
-    target_gray = np.mean(target_region, axis=2)
-    source_gray = np.mean(source_region, axis=2)
+    # Extended region for inpainting (include some context)
+    margin = VEO_INPAINT_MARGIN
+    ext_y1 = max(0, y - margin)
+    ext_y2 = min(img_h, y + h + margin)
+    ext_x1 = max(0, x - margin)
+    ext_x2 = min(img_w, x + w + margin)
+    ext = (slice(ext_y1, ext_y2), slice(ext_x1, ext_x2))
+    ext_shape = (ext_y2 - ext_y1, ext_x2 - ext_x1)
+    mask_y_offset = y - ext_y1
+    mask_x_offset = x - ext_x1
+    ext_target = (slice(mask_y_offset, mask_y_offset + h), slice(mask_x_offset, mask_x_offset + w))
 
-    # Estimate background brightness (lower percentile to ignore watermark)
-    background_level = np.percentile(target_gray, 30)
-    source_mean = source_gray.mean()
+    # Every pixel the removal reads: the source rows above plus the inpainting box
+    window = (slice(min(y - h, ext_y1), ext_y2), slice(ext_x1, ext_x2))
 
-    # Check if source differs significantly from target background
-    dynamic_threshold = max(15, background_level * 0.5)
-    is_dynamic = abs(source_mean - background_level) > dynamic_threshold
+    kernel = np.ones((3, 3), np.uint8)
 
-    if is_dynamic:
-        # Dynamic content: use OpenCV inpainting for natural filling
-        brightness_excess = target_gray - background_level
+    # Only feather top and left edges (bottom/right are at video edge)
+    feather_size = 5
+    source_weights, target_weights = _feather_weights(h, w, feather_size)
 
-        # Create mask of watermark pixels (bright text)
-        watermark_threshold = max(30, background_level * 0.5)
-        watermark_mask = (brightness_excess > watermark_threshold).astype(np.uint8)
+    def remove_uncached(image_array: np.ndarray) -> np.ndarray:
+        # Get regions for comparison
+        target_view = image_array[target]
+        source_view = image_array[source]
 
-        if not watermark_mask.any():
-            return image_array
+        target_gray = np.mean(target_view, axis=2, dtype=np.float32)
 
-        # Dilate mask slightly for better coverage
-        kernel = np.ones((3, 3), np.uint8)
-        watermark_mask = cv2.dilate(watermark_mask, kernel, iterations=1)
+        # Estimate background brightness (lower percentile to ignore watermark)
+        background_level = np.percentile(target_gray, 30)
+        source_mean = source_view.mean()
 
-        # Extract the extended region for inpainting (include some context)
-        margin = 10
-        ext_y1 = max(0, y - margin)
-        ext_y2 = min(img_h, y + h + margin)
-        ext_x1 = max(0, x - margin)
-        ext_x2 = min(img_w, x + w + margin)
+        # Check if source differs significantly from target background
+        dynamic_threshold = max(15, background_level * 0.5)
+        is_dynamic = abs(source_mean - background_level) > dynamic_threshold
 
-        ext_region = image_array[ext_y1:ext_y2, ext_x1:ext_x2].copy()
+        if is_dynamic:
+            # Dynamic content: use OpenCV inpainting for natural filling
+            brightness_excess = target_gray - background_level
 
-        # Create full mask for extended region
-        ext_mask = np.zeros((ext_y2 - ext_y1, ext_x2 - ext_x1), dtype=np.uint8)
-        mask_y_offset = y - ext_y1
-        mask_x_offset = x - ext_x1
-        ext_mask[mask_y_offset:mask_y_offset + h, mask_x_offset:mask_x_offset + w] = watermark_mask
+            # Create mask of watermark pixels (bright text)
+            watermark_threshold = max(30, background_level * 0.5)
+            watermark_mask = (brightness_excess > watermark_threshold).astype(np.uint8)
 
-        # Apply Telea inpainting (faster and works well for small regions)
-        inpainted = cv2.inpaint(ext_region, ext_mask, inpaintRadius=3, flags=cv2.INPAINT_TELEA)
+            if not watermark_mask.any():
+                return image_array
 
-        # Extract the inpainted Veo region
-        result = inpainted[mask_y_offset:mask_y_offset + h, mask_x_offset:mask_x_offset + w]
-    else:
-        # Static content: sample from above with edge feathering
-        result = source_region.copy()
+            # Dilate mask slightly for better coverage
+            watermark_mask = cv2.dilate(watermark_mask, kernel, iterations=1)
 
-        # Only feather top and left edges (bottom/right are at video edge)
-        feather_size = 5
+            # A handful of bright pixels is not text; skip the inpainting pass
+            if cv2.countNonZero(watermark_mask) < VEO_MIN_MASK_PIXELS:
+                return image_array
 
-        # Top edge feather
-        for i in range(feather_size):
-            alpha = i / feather_size
-            result[i, :] = (1 - alpha) * target_region[i, :] + alpha * result[i, :]
+            ext_region = image_array[ext].copy()
 
-        # Left edge feather
-        for j in range(feather_size):
-            alpha = j / feather_size
-            result[:, j] = (1 - alpha) * target_region[:, j] + alpha * result[:, j]
+            # Create full mask for extended region
+            ext_mask = np.zeros(ext_shape, dtype=np.uint8)
+            ext_mask[ext_target] = watermark_mask
 
-    image_array[y : y + h, x : x + w] = np.clip(result, 0, 255).astype(np.uint8)
+            # Apply Telea inpainting (faster and works well for small regions)
+            inpainted = cv2.inpaint(ext_region, ext_mask, inpaintRadius=3, flags=cv2.INPAINT_TELEA)
+
+            # Extract the inpainted Veo region
+            target_view[:] = inpainted[ext_target]
+        else:
+            # Static content: sample from above with edge feathering
+            # Blend in uint16 fixed point: 255 * 256 + 128 still fits, so the
+            # rounded result needs no clipping
+            blended = np.multiply(source_view, source_weights, dtype=np.uint16)
+            blended += np.multiply(target_view, target_weights, dtype=np.uint16)
+            blended += 128
+            blended >>= 8
+            np.copyto(target_view, blended, casting="unsafe")
 
-    return image_array
+        return image_array
+
+    if not reuse_unchanged:
+        return remove_uncached
+
+    last_window: np.ndarray | None = None
+    last_result: np.ndarray | None = None
+
+    def remove(image_array: np.ndarray) -> np.ndarray:
+        nonlocal last_window, last_result
+
+        current_window = image_array[window]
+        if last_window is not None and np.array_equal(current_window, last_window):
+            image_array[target] = last_result
+            return image_array
+
+        last_window = current_window.copy()
+        remove_uncached(image_array)
+        last_result = image_array[target].copy()
+        return image_array
+
+    return remove
+
+
+def remove_veo_watermark(
+    image_array: np.ndarray,
+    veo_pos: VeoWatermarkPosition,
+) -> np.ndarray:
+    """
+    Remove Veo watermark using hybrid approach with OpenCV inpainting.
+
+    For static/uniform backgrounds: sample from above (cleaner result).
+    For dynamic content: use OpenCV inpainting to fill watermark regions naturally.
+
+    Args:
+        image_array: Input image as numpy array (H, W, C)
+        veo_pos: Veo watermark position
+
+    Returns:
+        Modified image array with Veo watermark removed
+    """
+    img_h, img_w = image_array.shape[:2]
+    return _make_veo_remover(veo_pos, img_h, img_w)(image_array)
+
+
+def _read_frames(
+    stream: BinaryIO,
+    width: int,
+    height: int,
+    frame_queue: Queue,
+) -> None:
+    """Reader stage: read raw RGB frames from the ffmpeg decoder into a bounded queue."""
+    frame_size = width * height * 3
+    try:
+        while True:
+            buffer = bytearray(frame_size)
+            if stream.readinto(buffer) != frame_size:
+                break
+            frame_queue.put(np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3))
+    finally:
+        # Sentinel: no more frames
+        frame_queue.put(None)
+
+
+def _write_frames(stream: BinaryIO, frame_queue: Queue) -> None:
+    """Writer stage: pipe processed frames from a bounded queue into the ffmpeg encoder."""
+    broken = False
+    while (frame := frame_queue.get()) is not None:
+        if broken:
+            continue  # Keep draining so the compute stage never blocks
+        try:
+            stream.write(frame.data)
+        except BrokenPipeError:
+            # Encoder exited early; its return code is checked by the caller
+            broken = True
+    try:
+        stream.close()
+    except BrokenPipeError:
+        pass
+
+
+def _make_frame_remover(
+    gemini_pos: WatermarkPosition,
+    veo_pos: VeoWatermarkPosition,
+    img_h: int,
+    img_w: int,
+) -> Callable[[np.ndarray, bool], np.ndarray]:
+    """Build the per-frame stage: Gemini and Veo removal on a video frame."""
+    alpha_map = get_alpha_map(gemini_pos.size)
+    # Static corner content repeats across frames, so let the Veo stage reuse results
+    remove_veo = _make_veo_remover(veo_pos, img_h, img_w, reuse_unchanged=True)
+
+    def remove(frame: np.ndarray, remove_gemini: bool) -> np.ndarray:
+        # Remove Gemini watermark (alpha blending)
+        if remove_gemini:
+            remove_watermark(frame, alpha_map, gemini_pos, skip_detection=True)
+
+        # Remove Veo watermark (pixel sampling - no blur)
+        return remove_veo(frame)
+
+    return remove
 
 
 def process_video(
@@ -181,6 +332,7 @@ def process_video(
     output_path: Path | None = None,
     suffix: str = "_output",
     progress_callback: Callable[[int, int], None] | None = None,
+    threads: int | None = None,
 ) -> Path:
     """
     Process video to remove ALL watermarks (Gemini + Veo).
@@ -194,6 +346,7 @@ def process_video(
         output_path: Optional explicit output path
         suffix: Suffix for auto-generated output filename
         progress_callback: Optional callback(current_frame, total_frames)
+        threads: Optional thread limit for each ffmpeg process (defaults to ffmpeg's choice)
 
     Returns:
         Path to output MP4 file
@@ -222,96 +375,109 @@ def process_video(
     # Calculate bitrate
     bitrate = calculate_bitrate(width, height)
 
-    # Create temporary directory for frame processing
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        frames_dir = temp_path / "frames"
-        frames_dir.mkdir()
-
-        # Extract frames using ffmpeg
-        extract_cmd = (
-            ffmpeg.input(str(input_path))
-            .output(str(frames_dir / "frame_%06d.png"), format="image2")
-            .overwrite_output()
-            .compile()
-        )
-        subprocess.run(extract_cmd, stdin=subprocess.DEVNULL,
-                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-
-        # Process each frame for watermark removal
-        frame_files = sorted(frames_dir.glob("frame_*.png"))
-        processed_dir = temp_path / "processed"
-        processed_dir.mkdir()
-
-        # Initialize temporal processor for consistent watermark removal
-        temporal_processor = TemporalProcessor(gemini_pos, veo_pos)
-
-        for i, frame_file in enumerate(frame_files):
-            # Load frame
-            with Image.open(frame_file) as img:
-                frame_array = np.array(img.convert("RGB"), dtype=np.uint8)
-
-            # Keep original for optical flow computation
-            original_frame = frame_array.copy()
-
-            # Remove Gemini watermark (alpha blending)
-            result_array = remove_watermark(frame_array, alpha_map, gemini_pos)
-
-            # Remove Veo watermark (pixel sampling - no blur)
-            result_array = remove_veo_watermark(result_array, veo_pos)
+    # Cap ffmpeg threads when several videos are processed concurrently. The
+    # codec threads and the filter threads (the RGB <-> YUV conversion runs as an
+    # auto-inserted scale filter) both default to one per CPU otherwise
+    thread_args = ["-threads", str(threads)] if threads else []
+    filter_thread_args = ["-filter_threads", str(threads)] if threads else []
+
+    # Decode to raw RGB frames on stdout (no intermediate files)
+    decode_cmd = [
+        "ffmpeg", *filter_thread_args,
+        *thread_args, "-i", str(input_path),
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:",
+    ]
+
+    # Encode raw RGB frames from stdin
+    encode_cmd = [
+        "ffmpeg", "-y", *filter_thread_args,
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-framerate", str(fps),
+        "-i", "pipe:",
+    ]
+    if has_audio:
+        # Extract and merge audio from original
+        encode_cmd += ["-i", str(input_path), "-map", "0", "-map", "1:a"]
+    encode_cmd += [
+        "-vcodec", "libx264", "-preset", "medium", "-crf", "18", "-b:v", str(bitrate),
+        "-pix_fmt", "yuv420p", *thread_args,
+    ]
+    if has_audio:
+        encode_cmd += ["-acodec", "aac", "-b:a", "192k"]
+    encode_cmd.append(str(output_path))
+
+    decoder = subprocess.Popen(decode_cmd, stdin=subprocess.DEVNULL,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    encoder = subprocess.Popen(encode_cmd, stdin=subprocess.PIPE,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    # Three-stage pipeline: decode and encode run in their own threads so ffmpeg
+    # I/O overlaps with the per-frame NumPy work done here
+    read_queue: Queue = Queue(maxsize=VIDEO_QUEUE_SIZE)
+    write_queue: Queue = Queue(maxsize=VIDEO_QUEUE_SIZE)
+    reader = Thread(target=_read_frames, args=(decoder.stdout, width, height, read_queue),
+                    daemon=True)
+    writer = Thread(target=_write_frames, args=(encoder.stdin, write_queue), daemon=True)
+    reader.start()
+    writer.start()
+
+    # Initialize temporal processor for consistent watermark removal
+    temporal_processor = TemporalProcessor(gemini_pos, veo_pos)
+
+    # Positions are fixed for the whole video, so resolve the removal stage once
+    frame_remover = _make_frame_remover(gemini_pos, veo_pos, height, width)
+
+    # Every frame carries the same Gemini watermark, so once it has been detected
+    # on enough consecutive frames, skip the per-frame detector. Until then each
+    # frame is handled on its own detection, so one false positive on a clip
+    # without the watermark only affects that frame
+    gemini_streak = 0
+
+    frame_count = 0
+    completed = False
+    try:
+        while (frame_array := read_queue.get()) is not None:
+            if gemini_streak < GEMINI_LATCH_FRAMES:
+                gemini_detected = is_watermark_present(frame_array, alpha_map, gemini_pos)
+                gemini_streak = gemini_streak + 1 if gemini_detected else 0
+
+            # Optical flow only needs the original in grayscale, so convert before
+            # removing the watermarks in place instead of copying the whole frame
+            original_gray = cv2.cvtColor(frame_array, cv2.COLOR_RGB2GRAY)
+            frame_remover(frame_array, gemini_detected)
 
             # Apply temporal consistency to reduce flickering in motion
-            result_array = temporal_processor.process_frame(original_frame, result_array)
+            result_array = temporal_processor.process_frame(original_gray, frame_array)
 
-            # Save processed frame
-            result_image = Image.fromarray(result_array)
-            result_image.save(processed_dir / frame_file.name)
+            # Hand off to the encoder thread
+            write_queue.put(result_array)
 
-            # Report progress
+            # Report progress (frame count from metadata is only an estimate)
+            frame_count += 1
             if progress_callback:
-                progress_callback(i + 1, len(frame_files))
-
-        # Reassemble video with ffmpeg (no delogo filter needed now)
-        video_input = ffmpeg.input(
-            str(processed_dir / "frame_%06d.png"),
-            framerate=fps,
-        )
-
-        if has_audio:
-            # Extract and merge audio from original
-            audio_input = ffmpeg.input(str(input_path)).audio
-            reassemble_cmd = (
-                ffmpeg.output(
-                    video_input,
-                    audio_input,
-                    str(output_path),
-                    vcodec="libx264",
-                    preset="medium",
-                    crf=18,
-                    video_bitrate=bitrate,
-                    pix_fmt="yuv420p",
-                    acodec="aac",
-                    audio_bitrate="192k",
-                )
-                .overwrite_output()
-                .compile()
-            )
-        else:
-            reassemble_cmd = (
-                ffmpeg.output(
-                    video_input,
-                    str(output_path),
-                    vcodec="libx264",
-                    preset="medium",
-                    crf=18,
-                    video_bitrate=bitrate,
-                    pix_fmt="yuv420p",
-                )
-                .overwrite_output()
-                .compile()
-            )
-
-        subprocess.run(reassemble_cmd, stdin=subprocess.DEVNULL,
-                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+                progress_callback(frame_count, max(info["total_frames"], frame_count))
+        completed = True
+    finally:
+        if not completed:
+            # Stop decoding and drain so the reader thread can exit
+            decoder.kill()
+            while read_queue.get() is not None:
+                pass
+        reader.join()
+        decoder.wait()
+        failed = not completed or decoder.returncode != 0
+        if failed:
+            # Kill rather than close stdin, or the encoder would finalize a
+            # truncated but playable file
+            encoder.kill()
+        write_queue.put(None)
+        writer.join()
+        encoder.wait()
+        if failed or encoder.returncode != 0:
+            output_path.unlink(missing_ok=True)
+
+    if decoder.returncode != 0:
+        raise subprocess.CalledProcessError(decoder.returncode, decode_cmd)
+    if encoder.returncode != 0:
+        raise subprocess.CalledProcessError(encoder.returncode, encode_cmd)
 
     return output_path